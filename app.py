@@ -1,9 +1,11 @@
 
 import os
+import math
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import copy
 from typing import List, Dict
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 from dotenv import load_dotenv
@@ -15,6 +17,11 @@ load_dotenv()
 
 st.set_page_config(page_title="Volume Jinn", page_icon="🧞")
 
+# Per-exercise status templates, formatted inside the render loop
+_PROGRESS_TEMPL  = "{} / {} vol"
+_ADD_TEMPL       = "⬆️ Add {} vol more to hit your target."
+_SURPASSED_TEMPL = "✅ Surpassed target by {} vol"
+
 # ────────────────────────────────────────────────────────────────────────────
 # 🔑 0.  API‑key handling (stored only in this browser session)
 # ────────────────────────────────────────────────────────────────────────────
@@ -32,8 +39,13 @@ with st.sidebar:
             else:
                 st.warning("No key entered - you'll need one to proceed.")
 
+@st.cache_resource(max_entries=64, show_spinner=False)
+def _client(key: str) -> Hevy:
+    """One Hevy client per API key, kept across reruns so its HTTP session and caches survive."""
+    return Hevy(apikey=key)
+
 apikey = st.session_state.hevy_key or os.getenv("HEVY_API_KEY", "")
-hevy   = Hevy(apikey=apikey)
+hevy   = _client(apikey)
 
 if not apikey:
     st.info("Enter your personal Hevy API key in the sidebar to load a workout. Your key is stored **only in this browser session** and never logged.")
@@ -42,14 +54,40 @@ if not apikey:
 # ────────────────────────────────────────────────────────────────────────────
 st.title("Volume Jinn 🧞")
 
+# ─────────────────────────────── CACHED API CALLS ───────────────────────────
+# Hevy clients are keyed by their API key so sessions never share results.
+_HEVY_HASH = {Hevy: lambda h: h.apikey}
+
+@st.cache_data(ttl=300, show_spinner=False, hash_funcs=_HEVY_HASH)
+def _all_workouts(h: Hevy) -> tuple:
+    return tuple(sorted(h.get_all_workouts()))
+
+@st.cache_data(ttl=300, show_spinner=False, hash_funcs=_HEVY_HASH)
+def _all_exercises(h: Hevy) -> tuple:
+    return tuple(sorted(h.get_all_exercises()))
+
+@st.cache_data(ttl=60, show_spinner=False, hash_funcs=_HEVY_HASH)
+def _last_workout(h: Hevy, title: str | None):
+    return h.fetch_last_workout(title)
+
+@st.cache_data(ttl=60, show_spinner=False, hash_funcs=_HEVY_HASH)
+def _first_workout(h: Hevy, title: str | None):
+    return h.fetch_first_workout(title)
+
+@st.cache_data(show_spinner=False)
+def _fmt_header(title: str, event_ts: str, base_ts: str) -> str:
+    event_dt = datetime.fromisoformat(event_ts)
+    base_dt  = datetime.fromisoformat(base_ts)
+    return f"{title} · {event_dt:%B %d, %Y – %H:%M} | Baseline: {base_dt:%B %d, %Y}"
+
 # ───────────────────────────────── SIDEBAR INPUTS ────────────────────────────
 with st.sidebar:
     search_by = st.radio("Search by", ["Workout", "Exercise"])
 
     if search_by == "Workout":
-        workout_title = st.selectbox("Workout Title (leave empty for most recent)", options=sorted(hevy.get_all_workouts()), index=None, placeholder="(Latest workout)")
+        workout_title = st.selectbox("Workout Title (leave empty for most recent)", options=_all_workouts(hevy), index=None, placeholder="(Latest workout)")
     else:
-        exercise_titles = st.multiselect("Exercise Title", options=sorted(hevy.get_all_exercises()))
+        exercise_titles = st.multiselect("Exercise Title", options=_all_exercises(hevy))
 
     vol_bump_pct = st.slider("Volume increase target (%)", 0, 20, 5, 1) / 100
 
@@ -58,7 +96,7 @@ with st.sidebar:
 # ─────────────────────────────── DATA FETCH ─────────────────────────────────
 if search_by == "Workout":
     try:
-        raw_wk = hevy.fetch_last_workout(workout_title or None)
+        raw_wk = _last_workout(hevy, workout_title or None)
     except Exception as err:
         st.error(f"API error: {err}")
         st.stop()
@@ -68,20 +106,20 @@ if search_by == "Workout":
         st.stop()
 
     exercises = hevy.structure_workout_data(raw_wk)
+    if not exercises:
+        st.warning("No exercises found in that workout.")
+        st.stop()
+
     # Prefer the workout’s *performed* timestamp; fall back to creation time
     event_ts = raw_wk.get("performed_at") or raw_wk["created_at"]
-    event_dt = datetime.fromisoformat(event_ts.replace("Z", "+00:00"))
     # date/time of the chosen baseline session
     if baseline_source == "First session":
-        first_wk = hevy.fetch_first_workout(workout_title or None)
+        first_wk = _first_workout(hevy, workout_title or None)
         base_ts  = (first_wk.get("performed_at") if first_wk else None) or (first_wk.get("created_at") if first_wk else event_ts)
     else:  # baseline = last session (same as current)
         base_ts = event_ts
-    base_dt = datetime.fromisoformat(base_ts.replace("Z", "+00:00"))
 
-    st.header(
-        f"{raw_wk['title']} · {event_dt:%B %d, %Y – %H:%M} | Baseline: {base_dt:%B %d, %Y}"
-    )
+    st.header(_fmt_header(raw_wk["title"], event_ts, base_ts))
 
 else:
     if not exercise_titles:
@@ -91,6 +129,7 @@ else:
     exercises: List[ExerciseData] = []
     missing:   List[str] = []
 
+    # every lookup reads the same cached first page, so a plain loop is enough
     for title in exercise_titles:
         try:
             raw_ex = hevy.get_exercise_last_data(title)
@@ -114,71 +153,100 @@ else:
 
 # ──────────────────────────── UTILITY FUNCTIONS ─────────────────────────────
 
-def calc_volume(sets):
-    return sum((s.get("weight_kg", 0) or 0) * (s.get("reps", 0) or 0) for s in sets)
+def _volume(reps: np.ndarray, weights: np.ndarray) -> float:
+    return float(reps @ weights)
 
 
-def simple_increment_plan(original_sets, target_volume):
-    plan = copy.deepcopy(original_sets)
-    for s in plan:
-        s["reps"] = int(s.get("reps", 0))
-        s["weight_kg"] = s.get("weight_kg") or 0
-    guard = 0
-    while calc_volume(plan) < target_volume and guard < 200:
-        idx = max(range(len(plan)), key=lambda i: plan[i]["weight_kg"])
-        plan[idx]["reps"] += 1
-        guard += 1
-    return plan
+def calc_volume(ex: ExerciseData) -> float:
+    return _volume(ex["reps"], ex["weights"])
 
-# ──────────────────────── CACHED FIRST‑VOL LOOKUP ───────────────────────────
 
-@st.cache_data(show_spinner=False)
-def get_first_vol_map(names: tuple) -> Dict[str, int]:
-    """Return {exercise → first‑session volume} with one API sweep per rerun."""
-    vol_map = {}
-    for n in names:
-        first_data = hevy.get_first_exercise_data(n)
-        vol_map[n] = calc_volume(first_data["sets"]) if first_data else None
-    return vol_map
-
-first_vol_map = get_first_vol_map(tuple(e["exercise"] for e in exercises)) if baseline_source == "First session" else {}
+def simple_increment_plan(ex: ExerciseData, target_volume):
+    reps, weights = ex["reps"].copy(), ex["weights"]
+    if not reps.size:
+        return reps, weights
+    # weights never change, so every extra rep lands on the same heaviest set
+    idx     = int(np.argmax(weights))
+    missing = target_volume - calc_volume(ex)
+    if missing > 1e-6 and weights[idx] > 0:
+        reps[idx] += math.ceil((missing - 1e-6) / weights[idx])
+    return reps, weights
 
-# ───────────────────────────── MAIN LOOP ────────────────────────────────────
-for ex in exercises:
-    name          = ex["exercise"]
-    original_sets = ex["sets"]
-    last_vol      = ex["volume"] or 1
 
-    # ── baseline + targets --------------------------------------------------
-    if baseline_source == "First session":
-        baseline_vol = first_vol_map.get(name) or last_vol
-        absolute_increment = baseline_vol * vol_bump_pct
-        target_vol         = last_vol + absolute_increment
-    else:
-        baseline_vol       = last_vol
-        target_vol         = last_vol * (1 + vol_bump_pct)
-        absolute_increment = target_vol - last_vol
+@st.cache_data(ttl=600, show_spinner=False)
+def _opt(ex: ExerciseData, bump: float):
+    """Optimiser output memoised on its inputs, so reruns with unchanged sets skip the search."""
+    return hevy.get_optimized_options(ex, volume_perc=bump)
 
-    effective_bump_pct = max((target_vol / last_vol) - 1, 0)
 
-    # ── plan generation -----------------------------------------------------
+def _safe_opts(ex: ExerciseData, bump_pct, target_vol):
+    """Return (plan_reps, plan_weights, reasoning), falling back to the simple heuristic if the optimiser fails."""
     try:
-        opts      = hevy.get_optimized_options({"exercise": name, "sets": original_sets}, volume_perc=effective_bump_pct)
-        plan_sets = opts.get("final_sets") or original_sets
-        reasoning = opts.get("phases", "(no optimiser output)")
+        opts  = _opt(ex, bump_pct)
+        final = opts.get("final_sets")
+        if not final:
+            return ex["reps"], ex["weights"], opts.get("phases", "(no optimiser output)")
+        plan_reps    = np.fromiter((r for r, _ in final), dtype=np.int32, count=len(final))
+        plan_weights = np.fromiter((w for _, w in final), dtype=np.float64, count=len(final))
+        return plan_reps, plan_weights, opts.get("phases", "(no optimiser output)")
     except Exception:
-        plan_sets = simple_increment_plan(original_sets, target_vol)
-        reasoning = "Fallback heuristic plan (Hevy optimiser failed)"
+        return *simple_increment_plan(ex, target_vol), "Fallback heuristic plan (Hevy optimiser failed)"
+
+# ──────────────────────── CACHED FIRST‑VOL LOOKUP ───────────────────────────
+
+@st.cache_data(show_spinner=False, hash_funcs=_HEVY_HASH)
+def get_first_vol_map(h: Hevy, names: tuple) -> Dict[str, int]:
+    """Return {exercise → first‑session volume}, fetching all exercises concurrently."""
+    if not names:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(8, len(names))) as pool:
+        first_data = list(pool.map(h.get_first_exercise_data, names))
+    return {n: h.structure_exercise_data(d)["volume"] if d else None for n, d in zip(names, first_data)}
+
+first_vol_map = get_first_vol_map(hevy, tuple(e["exercise"] for e in exercises)) if baseline_source == "First session" else {}
+
+# ───────────────────────────── PLANS ────────────────────────────────────────
+# All plans are computed before anything is rendered, so the render loop below
+# only reads precomputed values.
+
+# ── baseline + targets, for all exercises at once ---------------------------
+last_vols = np.array([e["volume"] or 1 for e in exercises], dtype=np.float64)
+if baseline_source == "First session":
+    baseline_vols = np.array([first_vol_map.get(e["exercise"]) or lv for e, lv in zip(exercises, last_vols)], dtype=np.float64)
+    target_vols   = last_vols + baseline_vols * vol_bump_pct
+else:
+    baseline_vols = last_vols
+    target_vols   = last_vols * (1 + vol_bump_pct)
+bump_pcts = np.maximum(target_vols / last_vols - 1, 0)
+
+# ── plan generation ---------------------------------------------------------
+plans = []
+for ex, baseline_vol, target_vol, bump_pct in zip(exercises, baseline_vols.tolist(), target_vols.tolist(), bump_pcts.tolist()):
+    if vol_bump_pct == 0:   # slider at 0 %: the plan is the last session as-is
+        plan_reps, plan_weights, reasoning = ex["reps"], ex["weights"], "No bump requested"
+    else:
+        plan_reps, plan_weights, reasoning = _safe_opts(ex, bump_pct, target_vol)
+    plans.append((ex, baseline_vol, target_vol, plan_reps, plan_weights, reasoning))
 
+# ───────────────────────────── MAIN LOOP ────────────────────────────────────
+tabs = st.tabs([ex["exercise"] for ex in exercises])
+for tab, (ex, baseline_vol, target_vol, plan_reps, plan_weights, reasoning) in zip(tabs, plans):
+    name = ex["exercise"]
     # ── UI ------------------------------------------------------------------
-    with st.expander(name, expanded=True):
+    with tab:
         preset = st.radio("Start the editor with…", ["Last session", "Optimised plan"], horizontal=True, key=f"preset_{name}")
 
-        df_default = plan_sets if preset == "Optimised plan" else original_sets
-        df         = pd.DataFrame(df_default, columns=["reps", "kg"])
+        if preset == "Optimised plan":
+            reps, weights = plan_reps, plan_weights
+        else:
+            reps, weights = ex["reps"], ex["weights"]
+        df         = pd.DataFrame({"reps": reps, "kg": weights}, copy=False)
         edited_df  = st.data_editor(df, num_rows="dynamic", key=f"de_{name}")
 
-        current_vol = int((edited_df["reps"] * edited_df["kg"]).sum())
+        arr         = edited_df.to_numpy(dtype=np.float64, na_value=0.0)   # columns: reps, kg
+        # round the float product (not the weights) so noise like 1999.9999999
+        # doesn't truncate a whole unit off the volume
+        current_vol = int(round(float(arr[:, 0] @ arr[:, 1]), 6))
         diff_vol    = target_vol - current_vol
         pct_of_goal = current_vol / target_vol if target_vol else 0
 
@@ -187,12 +255,12 @@ for ex in exercises:
         cols[1].metric("Target vol", int(target_vol))
         cols[2].metric("Current vol", current_vol, delta=f"{round(diff_vol,1):+} vol")
 
-        st.progress(min(pct_of_goal, 1.0), text=f"{current_vol} / {int(target_vol)} vol")
+        st.progress(min(pct_of_goal, 1.0), text=_PROGRESS_TEMPL.format(current_vol, int(target_vol)))
 
         if diff_vol > 0:
-            st.write(f"⬆️ Add {(diff_vol)} vol more to hit your target.")
+            st.write(_ADD_TEMPL.format(diff_vol))
         elif diff_vol < 0:
-            st.write(f"✅ Surpassed target by {abs(diff_vol)} vol")
+            st.write(_SURPASSED_TEMPL.format(abs(diff_vol)))
         else:
             st.write("🎉 Damn exactly.")
 
@@ -1,6 +1,10 @@
-from typing import List, TypedDict, Tuple
+from typing import TypedDict
+
+import numpy as np
 
 class ExerciseData(TypedDict):
     exercise: str
-    sets: List[Tuple[int, float]]
-    volume: int
\ No newline at end of file
+    reps: np.ndarray      # int32, one entry per set
+    weights: np.ndarray   # float64 kg, one entry per set
+    logged: np.ndarray    # bool, set had both reps and weight recorded
+    volume: float
\ No newline at end of file
@@ -1,52 +1,154 @@
+import functools
 import math
+import threading
+import time
+import numpy as np
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Any, Dict, List, Optional, Tuple
+from urllib3.util.retry import Retry
 
 from datatypes import ExerciseData
 
 
+_LP_CANDIDATES = (9.0,)   # Leg Press only ever moves by one 9kg step
+
+
+@functools.lru_cache(maxsize=256)
+def _candidates(steps: int) -> Tuple[float, ...]:
+    """
+    Weight bump candidates: every 1.25kg step up to `steps` steps, counted
+    in whole 0.25kg quarters (5, 10, 15, ...) so each value is exact.
+    """
+    return tuple(q / 4 for q in range(5, 5*steps + 1, 5))
+
+
+def _greedy_reps(bumped_w: List[float], cap_extra: List[int], rem: float) -> Tuple[List[int], float]:
+    """
+    Add one rep at a time to the heaviest set that still has room under the
+    rep cap until `rem` volume is covered (or every set is capped).
+    Returns the extra reps per set and the volume they add.
+    """
+    n = len(bumped_w)
+    if all(bumped_w[i] >= bumped_w[i+1] for i in range(n-1)):
+        order = range(n)   # straight sets or a descending pyramid: already heaviest-first
+    else:
+        order = sorted(range(n), key=bumped_w.__getitem__, reverse=True)
+    extra = [0]*n
+    added = 0.0
+    # weights never change, so the heaviest set keeps every rep until it is
+    # capped; walk the sets once, heaviest first, instead of rescanning
+    for i in order:
+        if rem <= 0:
+            break
+        while extra[i] < cap_extra[i] and rem > 0:
+            extra[i] += 1
+            added += bumped_w[i]
+            rem -= bumped_w[i]
+    return extra, added
+
+
+def _fill_new_sets(rem: float, avg_w: float, rep_cap: int) -> Tuple[List[Tuple[int,float]], int, float]:
+    """
+    Cover `rem` volume with new sets at the average weight: as many full
+    rep_cap sets as fit, plus one partial set for the rest.
+    Returns (new sets, number of full sets, volume they add).
+    """
+    new_w = round(avg_w, 2)
+    unit = rep_cap * avg_w
+    full = int(rem // unit)
+    rem3 = rem - full*unit
+    plan = [(rep_cap, new_w)] * full
+    total_reps = full * rep_cap
+    if rem3 > 1e-6:
+        # tolerate float noise from the running totals so an exact remainder
+        # doesn't round up to a whole extra rep
+        rp = min(rep_cap, math.ceil(rem3/avg_w - 1e-9))
+        plan.append((rp, new_w))
+        total_reps += rp
+    return plan, full, total_reps * new_w
+
+
 class Hevy:
     def __init__(self, apikey):
         self.apikey = apikey
         self.all_workouts = {}
         self.all_exercises = {}
+        # one keep-alive session for every Hevy request, instead of a new TCP+TLS handshake per call
+        self._session = requests.Session()
+        self._session.headers.update({"accept": "application/json", "api-key": apikey})
+        self._session.mount("https://", HTTPAdapter(
+            pool_connections=4, pool_maxsize=8,
+            max_retries=Retry(total=2, backoff_factor=0.2)
+        ))
+        self._cache: tuple[float, dict] | None = None   # (fetch time, first-page payload)
+        self._cache_ttl = 30                              # seconds
+        self._etag: str | None = None
+        self._exercise_set: frozenset[str] = frozenset()   # exercise titles on the cached page
+        self._page_lock = threading.Lock()
+        self._history: tuple[float, int, List[dict]] | None = None   # (fetch time, max_pages, workouts)
+        self._history_lock = threading.Lock()
+
+    def refresh(self) -> None:
+        '''
+        Drop cached Hevy responses so the next call hits the API again.
+        '''
+        self._cache = None
+        self._etag = None
+        self._history = None
 
     # ----------------------------------
     # Fetching functions
     # ----------------------------------
     def fetch_first_page_of_data(self):
-        url = "https://api.hevyapp.com/v1/workouts?page=1"
-        headers = {
-            "accept": "application/json",
-            "api-key": self.apikey
-        }
-        response = requests.get(url=url, headers=headers)
-
-        if response.status_code == 401:
-            raise ValueError("Invalid API key - Hevy returned 401 Unauthorized")
-        if not response.ok:
-            raise RuntimeError(f"Hevy API error {response.status_code}: {response.text[:120]}")
-        try:
-            payload = response.json()
-        except ValueError as e:
-            raise RuntimeError("Hevy response was not JSON, check the key/network") from e
-
-        return payload
+        '''
+        First page of workouts, shared for `_cache_ttl` seconds. Concurrent
+        callers wait for a single request instead of each fetching the page.
+        '''
+        with self._page_lock:
+            if self._cache and time.monotonic() - self._cache[0] < self._cache_ttl:
+                return self._cache[1]
+
+            url = "https://api.hevyapp.com/v1/workouts?page=1"
+            headers = {}
+            if self._cache and self._etag:
+                headers["If-None-Match"] = self._etag
+            response = self._session.get(url=url, headers=headers)
+
+            if response.status_code == 304 and self._cache:
+                self._cache = (time.monotonic(), self._cache[1])
+                return self._cache[1]
+            if response.status_code == 401:
+                raise ValueError("Invalid API key - Hevy returned 401 Unauthorized")
+            if not response.ok:
+                raise RuntimeError(f"Hevy API error {response.status_code}: {response.text[:120]}")
+            try:
+                # orjson parses straight from the raw bytes, skipping the text decode
+                payload = orjson.loads(response.content)
+            except ValueError as e:
+                raise RuntimeError("Hevy response was not JSON, check the key/network") from e
+
+            self._etag = response.headers.get("ETag")
+            # fill the title set before publishing the page, so no caller sees a
+            # fresh payload next to an empty set
+            self._exercise_set = frozenset(ex['title'] for w in payload['workouts'] for ex in w['exercises'])
+            self._cache = (time.monotonic(), payload)
+            return payload
 
 
     def get_all_workouts(self):
         data = self.fetch_first_page_of_data()
 
-        all_workouts = set([ex['title'] for ex in [w for w in data['workouts']]])
+        all_workouts = {w['title'] for w in data['workouts']}
         self.all_workouts = all_workouts
         return all_workouts
     
 
     def get_all_exercises(self):
-        data = self.fetch_first_page_of_data()
+        self.fetch_first_page_of_data()
 
-        all_exercises = [[ex['title'] for ex in w['exercises']] for w in data['workouts']]
-        unique_exercises = sorted(set(sum(all_exercises, [])))
+        unique_exercises = sorted(self._exercise_set)
 
         self.all_exercises = unique_exercises
         return unique_exercises
@@ -85,27 +187,37 @@ class Hevy:
     def get_exercise_last_data(self, exercise_name: str) -> dict | None:
         payload = self.fetch_first_page_of_data()
 
-        if exercise_name not in self.all_exercises:
+        if exercise_name not in self._exercise_set:
             return {'error':"Exercise not found in data"}
-        else:
-            for workout in payload['workouts']:
-                for exercise in workout['exercises']:
-                    if exercise['title'] == exercise_name:
-                        return exercise
+        for workout in payload['workouts']:
+            for exercise in workout['exercises']:
+                if exercise['title'] == exercise_name:
+                    return exercise
+        return {'error':"Exercise not found in data"}
 
 
     def fetch_all_workouts(self, max_pages: int = 30) -> List[dict]:
         '''
         Retrieve the full workout history (up to `max_pages` pages).
+        The history is shared for `_cache_ttl` seconds, and concurrent callers
+        wait for a single download instead of each paging through it.
         '''
+        with self._history_lock:
+            if (self._history and self._history[1] == max_pages
+                    and time.monotonic() - self._history[0] < self._cache_ttl):
+                return self._history[2]
+            workouts = self._download_all_workouts(max_pages)
+            self._history = (time.monotonic(), max_pages, workouts)
+            return workouts
+
+    def _download_all_workouts(self, max_pages: int) -> List[dict]:
         workouts: List[dict] = []
         for page in range(1, max_pages + 1):
             url = f'https://api.hevyapp.com/v1/workouts?page={page}'
-            headers = {'accept': 'application/json', 'api-key': self.apikey}
-            resp = requests.get(url, headers=headers)
+            resp = self._session.get(url)
             if not resp.ok:
                 break
-            payload = resp.json()
+            payload = orjson.loads(resp.content)
             batch = payload.get('workouts', [])
             if not batch:
                 break
@@ -137,23 +249,34 @@ class Hevy:
         return None
 
 
-    def calculate_exercise_volume(self, exercise_data: List[dict]) -> int:
-        total_volume = 0
-        for s in exercise_data:
-            total_volume += s['weight_kg'] * s['reps'] if s['weight_kg'] and s['reps'] else 0
-        
-        return total_volume
+    def calculate_exercise_volume(self, reps: np.ndarray, weights: np.ndarray) -> float:
+        # structure_sets already turned missing reps/weights into 0
+        return float(reps @ weights)
     
 
+    def structure_sets(self, sets: List[dict]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        '''
+        Split Hevy set dicts into parallel reps / weight arrays (missing values → 0),
+        plus a mask of the sets that had both reps and weight logged.
+        '''
+        reps    = np.fromiter((s['reps'] or 0 for s in sets), dtype=np.int32, count=len(sets))
+        weights = np.fromiter((s['weight_kg'] or 0.0 for s in sets), dtype=np.float64, count=len(sets))
+        logged  = np.fromiter((s['reps'] is not None and s['weight_kg'] is not None for s in sets), dtype=bool, count=len(sets))
+        return reps, weights, logged
+
+
     def structure_workout_data(self, workout_data: dict) -> List[ExerciseData]:
         schema = []
         for exercise in workout_data['exercises']:
 
-            exercise_volume = self.calculate_exercise_volume(exercise['sets'])
+            reps, weights, logged = self.structure_sets(exercise['sets'])
+            exercise_volume = self.calculate_exercise_volume(reps, weights)
 
             exercise_data = ExerciseData(
                 exercise=exercise['title'],
-                sets=[(s['reps'], s['weight_kg']) for s in exercise['sets']],
+                reps=reps,
+                weights=weights,
+                logged=logged,
                 volume=exercise_volume
             )
             schema.append(exercise_data)
@@ -162,11 +285,14 @@ class Hevy:
     
     def structure_exercise_data(self, exercise_data: dict) -> ExerciseData:
 
-        exercise_volume = self.calculate_exercise_volume(exercise_data['sets'])
+        reps, weights, logged = self.structure_sets(exercise_data['sets'])
+        exercise_volume = self.calculate_exercise_volume(reps, weights)
 
         structured_exercise = ExerciseData(
             exercise=exercise_data['title'],
-            sets=[(s['reps'], s['weight_kg']) for s in exercise_data['sets']],
+            reps=reps,
+            weights=weights,
+            logged=logged,
             volume=exercise_volume
             )
 
@@ -190,26 +316,40 @@ class Hevy:
         n = len(base_sets)
         # pick weight bump candidates
         if exercise_name == 'Leg Press Horizontal (Machine)':
-            candidates = [9.0]
+            candidates = _LP_CANDIDATES
         else:
-            max_w_inc = math.floor((avg_w*max_pct_wb)/1.25)*1.25
-            candidates = [1.25 * i for i in range(1, int(max_w_inc/1.25)+1)]
-
-        best = None
-        for w_inc in candidates:
-            # apply uniform weight bump
-            bumped = [(r, w + w_inc) for r,w in base_sets]
-            added_wvol = sum(r * w_inc for r,_ in base_sets)
-            rem1 = delta - added_wvol
-            if rem1 <= 0:
+            # whole 1.25kg steps (5 quarters) under the cap; scaling by 4 is exact
+            candidates = _candidates(int(avg_w*max_pct_wb*4) // 5)
+
+        # A uniform bump of w_inc adds total_reps * w_inc, so the smallest
+        # bump that covers delta on its own follows directly from a division;
+        # candidates are whole multiples of the first one.
+        total_reps = sum(r for r,_ in base_sets)
+        if candidates and total_reps > 0:
+            k = min(max(1, math.ceil(delta / (total_reps * candidates[0]))), len(candidates) + 1)
+            # nudge past float rounding so k is exactly the first feasible step
+            while k > 1 and delta - total_reps * candidates[k-2] <= 0:
+                k -= 1
+            while k <= len(candidates) and delta - total_reps * candidates[k-1] > 0:
+                k += 1
+            if k <= len(candidates):
+                w_inc = candidates[k-1]
+                added_wvol = total_reps * w_inc
                 return {
                     'w_inc': w_inc,
                     'bump_reps': [0]*n,
                     'total_added': added_wvol,
                     'overshoot': added_wvol - delta,
-                    'final_sets': bumped
+                    'final_sets': [(r, w + w_inc) for r,w in base_sets]
                 }
 
+        best = None
+        for w_inc in candidates:
+            # apply uniform weight bump
+            bumped = [(r, w + w_inc) for r,w in base_sets]
+            added_wvol = total_reps * w_inc
+            rem1 = delta - added_wvol
+
             # greedy‐rep on bumped
             bump_r = [0]*n
             cap_extra = [rep_cap - r for r,_ in base_sets]
@@ -224,18 +364,9 @@ class Hevy:
             rem2 = rem1 - repfloor_added
 
             # one-rep at a time on heaviest
-            added_rvol = repfloor_added
-            order = sorted(range(n), key=lambda i: bumped[i][1], reverse=True)
-            while rem2 > 0:
-                for i in order:
-                    if cap_extra[i] > 0:
-                        bump_r[i] += 1
-                        cap_extra[i] -= 1
-                        added_rvol += bumped[i][1]
-                        rem2 -= bumped[i][1]
-                        break
-                else:
-                    break
+            extra_r, greedy_added = _greedy_reps([w for _,w in bumped], cap_extra, rem2)
+            bump_r = [b + e for b, e in zip(bump_r, extra_r)]
+            added_rvol = repfloor_added + greedy_added
 
             total_added = added_wvol + added_rvol
             overshoot = total_added - delta
@@ -264,9 +395,15 @@ class Hevy:
         rep_floor: int = 6,
         rep_cap:   int = 12
     ) -> Dict[str,Any]:
-        orig = [(r,w) for r,w in data['sets'] if r is not None and w is not None]
+        # Work on the reps/weights arrays directly. Sets missing reps or
+        # weight are skipped; sets explicitly logged as 0 stay in the plan.
+        reps, weights = data['reps'], data['weights']
+        logged = data.get('logged')
+        if logged is not None:
+            reps, weights = reps[logged], weights[logged]
+
         # handle exercises with no valid weight data
-        if not orig:
+        if not reps.size:
             return {
                 'delta':          0.0,
                 'target_volume':  0.0,
@@ -274,24 +411,21 @@ class Hevy:
                 'final_sets':     []
             }
 
-        total_vol    = sum(r*w for r,w in orig)
+        # structure_* already computed the volume; only sum it when the caller didn't pass it
+        total_vol    = data.get('volume')
+        if total_vol is None:
+            total_vol = float(reps @ weights)
         target_vol   = total_vol * (1 + volume_perc)
         delta        = target_vol - total_vol
-        n            = len(orig)
-        avg_w        = sum(w for _,w in orig) / n
+        avg_w        = float(weights.mean())
         ex_name      = data.get('exercise','')
         result       = {'delta': delta, 'target_volume': target_vol, 'phases': []}
 
         # Phase 0: flatten >rep_cap
-        lost = 0.0
-        base_sets = []
-        for r,w in orig:
-            if r > rep_cap:
-                lost += (r - rep_cap)*w
-                base_sets.append((rep_cap,w))
-            else:
-                base_sets.append((r,w))
-        vol0 = sum(r*w for r,w in base_sets)
+        flat_reps = np.minimum(reps, rep_cap)
+        lost      = float((reps - flat_reps) @ weights)
+        vol0      = float(flat_reps @ weights)
+        base_sets = list(zip(flat_reps.tolist(), weights.tolist()))
         rem0 = target_vol - vol0
         result['phases'].append({
             'phase': 0,
@@ -328,14 +462,7 @@ class Hevy:
             sets_so_far = base_sets
 
         # Phase 3: add new sets at rep_cap
-        unit = rep_cap * avg_w
-        full = int(rem1 // unit)
-        rem3 = rem1 - full*unit
-        plan = [(rep_cap, round(avg_w,2)) for _ in range(full)]
-        if rem3 > 1e-6:
-            rp = min(rep_cap, math.ceil(rem3/avg_w))
-            plan.append((rp, round(avg_w,2)))
-        added3 = sum(r*w for r,w in plan)
+        plan, full, added3 = _fill_new_sets(rem1, avg_w, rep_cap)
         final = sets_so_far + plan
 
         result['phases'].append({
@@ -1,4 +1,5 @@
 import os
+import asyncio
 import logging
 from dotenv import load_dotenv
 from telegram import Update
@@ -22,6 +23,54 @@ HEVY_API_KEY = os.getenv('HEVY_API_KEY')
 
 hevy = Hevy(apikey=HEVY_API_KEY)
 
+TELEGRAM_MAX_LEN = 4096
+
+
+def split_block(block: str, limit: int = TELEGRAM_MAX_LEN) -> list[str]:
+    """
+    Break a block longer than the limit into pieces on line boundaries.
+    A single line that is itself too long is cut at the limit.
+    """
+    pieces: list[str] = []
+    current = ""
+    for line in block.split("\n"):
+        while len(line) > limit:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(line[:limit])
+            line = line[limit:]
+        candidate = f"{current}\n{line}" if current else line
+        if current and len(candidate) > limit:
+            pieces.append(current)
+            current = line
+        else:
+            current = candidate
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_blocks(blocks: list[str], limit: int = TELEGRAM_MAX_LEN) -> list[str]:
+    """
+    Join message blocks with blank lines, starting a new message whenever the
+    next block would push the current one past Telegram's length limit.
+    Blocks that are too long on their own are split first.
+    """
+    chunks: list[str] = []
+    current = ""
+    for block in (piece for b in blocks for piece in (split_block(b, limit) if len(b) > limit else [b])):
+        candidate = f"{current}\n\n{block}" if current else block
+        if current and len(candidate) > limit:
+            chunks.append(current)
+            current = block
+        else:
+            current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
     /start handler: introduces the bot.
@@ -45,7 +94,10 @@ async def plan(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     workout_title = " ".join(context.args).strip() or None   # "" → None
 
     try:
-        last_workout = hevy.fetch_last_workout(
+        # Hevy's client is blocking; run it off the event loop so other
+        # updates keep being served while the request is in flight
+        last_workout = await asyncio.to_thread(
+            hevy.fetch_last_workout,
             workout_title=workout_title
         )
         if not last_workout:
@@ -60,6 +112,9 @@ async def plan(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
             await update.message.reply_text("No exercises found in that workout.")
             return
 
+        # One block per exercise, sent together with the summary at the end
+        blocks: list[str] = []
+
         # Running totals for the final summary (exact, not theoretical)
         total_prev_vol     = 0
         total_target_vol   = 0
@@ -67,12 +122,11 @@ async def plan(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 
         for ex in exercises:
             name       = ex['exercise']
-            sets       = ex['sets']
             prev_vol   = ex['volume']
 
             # Build +5 % plan
             opts = hevy.get_optimized_options(
-                {'exercise': name, 'sets': sets},
+                ex,
                 0.05                     # Ask for +5 % target
             )
             target_vol = opts.get('target_volume', 0)
@@ -100,10 +154,7 @@ async def plan(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
             for i, (reps, weight) in enumerate(opts.get('final_sets', []), 1):
                 lines.append(f"  • Set {i}: {reps} × {weight}")
 
-            await update.message.reply_text(
-                "\n".join(lines),
-                parse_mode="Markdown"
-            )
+            blocks.append("\n".join(lines))
 
         # ── Summary after all exercises ──────────────────────────────────────
         if total_prev_vol:
@@ -118,7 +169,10 @@ async def plan(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
             f"Target Total Vol:    {int(total_target_vol)}  ({pct_change_target_total:+.0f} %)",
             f"Exact  Total Vol:    {int(total_exact_new_vol)}  ({pct_change_exact_total:+.0f} %)"
         ]
-        await update.message.reply_text("\n".join(summary), parse_mode="Markdown")
+        blocks.append("\n".join(summary))
+
+        for chunk in chunk_blocks(blocks):
+            await update.message.reply_text(chunk, parse_mode="Markdown")
 
     except Exception as e:
         logger.error("Error generating plan:", exc_info=e)